@@ -1,11 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routers import users, stalls, slots, bookings, get_available_slots, book, pay, cancel_booking
+from routers import users, stalls, slots, bookings, get_available_slots, book, pay, cancel_booking, waitlist, qr_tokens
+from utils import config
+from utils.database import prewarm_pool, close_pool
+from utils.outbox import outbox_workers
+
+@asynccontextmanager
+async def lifespan(app):
+    # open the database connections before the first request, if asked to
+    if config.DB_POOL_PREWARM:
+        prewarm_pool()
+    # send the booking side-effects in the background while the app is running,
+    # the handlers are only needed by the workers, so they are registered here and not on import
+    import utils.outbox_handlers  # noqa: F401
+    outbox_workers.start()
+    yield
+    outbox_workers.stop()
+    close_pool()
 
 # Initialize the app
 app = FastAPI(
     title="Market Connect API",
     description="Backend API for stall reservation system",
-    version="0.0.0"
+    version="0.0.0",
+    lifespan=lifespan
 )
 
 @app.get("/")
@@ -21,4 +39,6 @@ app.include_router(get_available_slots.router)
 app.include_router(book.router)
 app.include_router(pay.router)
 app.include_router(cancel_booking.router)
+app.include_router(waitlist.router)
+app.include_router(qr_tokens.router)
 
@@ -2,7 +2,9 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from utils.database import get_db_connection
+from utils.database import get_db_connection, run_in_transaction
+from utils.admission import slot_admission, Admission
+from utils.outbox import enqueue_event
 from routers.enums import SlotStatus
 
 router = APIRouter()
@@ -10,13 +12,33 @@ router = APIRouter()
 class BookingRequest(BaseModel):
     user_id: int
     slot_id: int
+
+async def admit_booking( request: BookingRequest ):
+    """
+    lets a booking request through to the database only if the slot is not known to be taken
+    and there is room for one more contender on it, this runs before a connection is opened.
+    it is async so queued requests wait on the event loop instead of holding threadpool threads
+    """
+    admission = await slot_admission.enter(request.slot_id)
+    if admission == Admission.SOLD:
+        raise HTTPException(status_code=409, detail="Too slow! This slot is already booked.")
+    if admission == Admission.SHED:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many booking requests right now, please try again.",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        yield
+    finally:
+        slot_admission.leave(request.slot_id)
+
 @router.post("/book")
-def book_stall( request: BookingRequest, conn = Depends(get_db_connection) ):
+def book_stall( request: BookingRequest, admission = Depends(admit_booking), conn = Depends(get_db_connection) ):
     """
     books a stall by user_id and slot_id
     """
-    cursor = conn.cursor()
-    try:
+    def book(cursor):
         # Check if user exists
         cursor.execute(
             "SELECT user_id FROM users WHERE user_id = %s;", 
@@ -26,26 +48,22 @@ def book_stall( request: BookingRequest, conn = Depends(get_db_connection) ):
         if not user_row:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Check if slot exists and is available
+        # Take the slot only if it is still available, checking and booking in one statement
         cursor.execute(
-            "SELECT status FROM slots WHERE slot_id = %s FOR UPDATE;", 
-            (request.slot_id,)
+            "UPDATE slots SET status = %s WHERE slot_id = %s AND status = %s RETURNING slot_id;",
+            (SlotStatus.BOOKED.value, request.slot_id, SlotStatus.AVAILABLE.value)
         )
-        slot_row = cursor.fetchone()
-        if not slot_row:
-            raise HTTPException(status_code=404, detail="Slot not found")
-        
-        current_status = slot_row['status']
-
-        if current_status != SlotStatus.AVAILABLE.value:
-            conn.rollback() # Cancel transaction
+        if not cursor.fetchone():
+            cursor.execute(
+                "SELECT status FROM slots WHERE slot_id = %s;",
+                (request.slot_id,)
+            )
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Slot not found")
+            slot_admission.mark_sold(request.slot_id)
             # Return 409 Conflict (standard for "state conflict")
             raise HTTPException(status_code=409, detail="Too slow! This slot is already booked.")
-        
-        cursor.execute(
-            "UPDATE slots SET status = %s WHERE slot_id = %s;",
-            (SlotStatus.BOOKED.value, request.slot_id)
-        )
+
         cursor.execute(
             """
             INSERT INTO bookings (user_id, slot_id, payment_status) 
@@ -55,8 +73,16 @@ def book_stall( request: BookingRequest, conn = Depends(get_db_connection) ):
             (request.user_id, request.slot_id)
         )
         new_booking_id = cursor.fetchone()['booking_id']
+        enqueue_event(cursor, "booking.created", {
+            "booking_id": new_booking_id,
+            "user_id": request.user_id,
+            "slot_id": request.slot_id
+        })
+        return new_booking_id
 
-        conn.commit() # Commit transaction
+    try:
+        new_booking_id = run_in_transaction(conn, book)
+        slot_admission.mark_sold(request.slot_id)
         
         return {
             "status": "success", 
@@ -64,12 +90,8 @@ def book_stall( request: BookingRequest, conn = Depends(get_db_connection) ):
             "booking_id": new_booking_id
         }
     except Exception as e:
-        conn.rollback() # If any error happens, undo everything
         # If it's already an HTTPException (like 409 or 404), re-raise it
         if isinstance(e, HTTPException):
             raise e
         # Otherwise, it's a server error
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        cursor.close()
@@ -4,7 +4,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from utils.database import get_db_connection
-from tabulate import tabulate
+from utils.qr_token import revoke, remember_revoked
 from fastapi.responses import PlainTextResponse
 
 
@@ -37,6 +37,9 @@ def get_bookings_table(conn = Depends(get_db_connection)):
         if not bookings:
             return "No bookings found."
 
+        # tabulate is only needed here, so it is not loaded at startup
+        from tabulate import tabulate
+
         # Convert the list of dictionaries into the table format
         table_content = tabulate(bookings, headers="keys", tablefmt="psql")
 
@@ -54,6 +57,8 @@ def delete_booking( request: DeleteBookingRequest, conn = Depends(get_db_connect
     """
     cursor = conn.cursor()
     try:
+        # The booking is going away, so its QR token shouldn't open the gate anymore
+        revoke(cursor, request.booking_id)
         cursor.execute(
             "DELETE FROM bookings WHERE booking_id = %s;",
             (request.booking_id,)
@@ -63,6 +68,7 @@ def delete_booking( request: DeleteBookingRequest, conn = Depends(get_db_connect
             raise HTTPException(status_code=404, detail="Booking not found")
         
         conn.commit()
+        remember_revoked(request.booking_id)
         return {
             "status": "success",
             "message": "Booking deleted successfully!"
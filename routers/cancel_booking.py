@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from utils.database import get_db_connection
+from utils.database import get_db_connection, run_in_transaction
+from utils.admission import slot_admission
+from utils.waitlist import promote_next_waiter
+from utils.outbox import enqueue_event
 
 router = APIRouter()
 
@@ -9,47 +12,87 @@ class CancelBookingRequest(BaseModel):
 @router.put("/cancel_booking")
 def cancel_booking( request: CancelBookingRequest, conn = Depends(get_db_connection) ):
     """
-    cancels a booking by booking_id,
-    also frees up the slot associated with the booking
+    cancels a booking by booking_id, only a PENDING booking can be cancelled.
+    the slot goes to the first user on its waitlist, or is freed up if nobody is waiting
     """
-    cursor = conn.cursor()
-    try:
-        # Get the slot_id associated with the booking
+    def cancel(cursor):
+        # Get the slot_id associated with the booking, it never changes so no lock is needed
         cursor.execute(
-            "SELECT slot_id, payment_status FROM bookings WHERE booking_id = %s;",
+            "SELECT slot_id FROM bookings WHERE booking_id = %s;",
             (request.booking_id,)
         )
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Booking not found")
-        
         slot_id = row['slot_id']
-        payment_status = row['payment_status']
 
-        # Prevent cancellation if already paid
-        if payment_status == 'PAID':
-            raise HTTPException(status_code=400, detail="Cannot cancel a paid booking")
-        
-        # Update the booking status to canceled
+        # Lock the slot first, the same order as /book, so the two can't deadlock.
+        # this also keeps anyone from joining its waitlist while we hand it over
         cursor.execute(
-            "UPDATE bookings SET payment_status = 'CANCELED' WHERE booking_id = %s;",
-            (request.booking_id,)
+            "SELECT slot_id FROM slots WHERE slot_id = %s FOR UPDATE;",
+            (slot_id,)
         )
 
-        # Free up the slot by setting its status to available (0)
+        # Cancel the booking only if it is still pending, checking and cancelling in one statement,
+        # so a /pay that commits in between can't be overwritten
         cursor.execute(
-            "UPDATE slots SET status = 0 WHERE slot_id = %s;",
-            (slot_id,)
+            """
+            UPDATE bookings SET payment_status = 'CANCELED', canceled_at = CURRENT_TIMESTAMP
+            WHERE booking_id = %s AND payment_status = 'PENDING'
+            RETURNING user_id;
+            """,
+            (request.booking_id,)
         )
+        booking_row = cursor.fetchone()
+        if not booking_row:
+            cursor.execute(
+                "SELECT payment_status FROM bookings WHERE booking_id = %s;",
+                (request.booking_id,)
+            )
+            status_row = cursor.fetchone()
+            # The booking was deleted after we read its slot_id
+            if not status_row:
+                raise HTTPException(status_code=404, detail="Booking not found")
+            payment_status = status_row['payment_status']
+            # Prevent cancellation if already paid
+            if payment_status == 'PAID':
+                raise HTTPException(status_code=400, detail="Cannot cancel a paid booking")
+            raise HTTPException(status_code=409, detail=f"Cannot cancel a {payment_status} booking")
+
+        enqueue_event(cursor, "booking.canceled", {
+            "booking_id": request.booking_id,
+            "user_id": booking_row['user_id'],
+            "slot_id": slot_id
+        })
+
+        # Give the slot to the first user on the waitlist, if there is one
+        promoted = promote_next_waiter(cursor, slot_id)
+        if not promoted:
+            # Free up the slot by setting its status to available (0)
+            cursor.execute(
+                "UPDATE slots SET status = 0 WHERE slot_id = %s;",
+                (slot_id,)
+            )
+        return slot_id, promoted
+
+    try:
+        slot_id, promoted = run_in_transaction(conn, cancel)
 
-        conn.commit()
+        if promoted:
+            return {
+                "status": "success",
+                "message": "Booking cancelled and slot passed on to the waitlist!",
+                "promoted_booking_id": promoted['booking_id'],
+                "promoted_user_id": promoted['user_id']
+            }
 
+        slot_admission.mark_available(slot_id)
         return {
             "status": "success",
             "message": "Booking cancelled and slot freed successfully!"
         }
     except Exception as e:
-        conn.rollback()
+        # If it's already an HTTPException (like 409 or 404), re-raise it
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Error cancelling booking: {e}")
-    finally:
-        cursor.close()
\ No newline at end of file
@@ -2,7 +2,8 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from utils.database import get_db_connection
+from utils.database import get_db_connection, run_in_transaction
+from utils.outbox import enqueue_event
 
 router = APIRouter()
 
@@ -12,38 +13,58 @@ class PaymentRequest(BaseModel):
 @router.put("/pay")
 def process_payment(request: PaymentRequest, conn = Depends(get_db_connection)):
     """
-    processes a payment for a booking
+    processes a payment for a booking,
+    only a PENDING booking can be paid. the slot's waitlist is cleared, it can't be handed on anymore
     """
-    cursor = conn.cursor()
-    try:
-        # Check if booking exists
+    def pay(cursor):
+        # Mark the booking as paid only if it is still pending, checking and paying in one statement
         cursor.execute(
-            "SELECT booking_id FROM bookings WHERE booking_id = %s FOR UPDATE;",
-            (request.booking_id,)
+            """
+            UPDATE bookings SET payment_status = 'PAID', payment_method = %s
+            WHERE booking_id = %s AND payment_status = 'PENDING'
+            RETURNING user_id, slot_id;
+            """,
+            (request.payment_method, request.booking_id)
         )
         booking_row = cursor.fetchone()
         if not booking_row:
-            raise HTTPException(status_code=404, detail="Booking not found")
+            # Find out why, the booking is either missing or not pending anymore
+            cursor.execute(
+                "SELECT payment_status FROM bookings WHERE booking_id = %s;",
+                (request.booking_id,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Booking not found")
+            raise HTTPException(status_code=409, detail=f"Cannot pay a {row['payment_status']} booking")
+
+        enqueue_event(cursor, "booking.paid", {
+            "booking_id": request.booking_id,
+            "user_id": booking_row['user_id'],
+            "slot_id": booking_row['slot_id']
+        })
 
-        # Update payment status
+        # A paid slot is never handed on, so let the users waiting for it know and stop waiting
         cursor.execute(
-            "UPDATE bookings SET payment_status = 'PAID', payment_method = %s WHERE booking_id = %s;",
-            (request.payment_method, request.booking_id)
+            "DELETE FROM waitlist WHERE slot_id = %s RETURNING user_id;",
+            (booking_row['slot_id'],)
         )
+        for waiter in cursor.fetchall():
+            enqueue_event(cursor, "waitlist.closed", {
+                "user_id": waiter['user_id'],
+                "slot_id": booking_row['slot_id']
+            })
 
-        conn.commit()
+    try:
+        run_in_transaction(conn, pay)
 
         return {
             "status": "success",
             "message": "Payment processed successfully!"
         }
     except Exception as e:
-        conn.rollback()
         # If it's already an HTTPException (like 409 or 404), re-raise it
         if isinstance(e, HTTPException):
             raise e
         # Otherwise, it's a server error
         raise HTTPException(status_code=500, detail=str(e))
-
-    finally:
-        cursor.close()
\ No newline at end of file
@@ -0,0 +1,83 @@
+# /verify_qr_token: Endpoint to check a QR token at the market gate, without the database
+# /get_qr_tokens: Endpoint for gate devices to download all valid QR tokens of a day
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from utils import config
+from utils.database import get_db_connection
+from utils.qr_token import verify_token, QrTokenConfigError
+
+router = APIRouter()
+
+class VerifyQrTokenRequest(BaseModel):
+    token: str
+@router.post("/verify_qr_token")
+def verify_qr_token( request: VerifyQrTokenRequest ):
+    """
+    checks a scanned QR token, only its signature, date and the cached revoked tokens are checked,
+    so this works the same on a gate device that is offline and holds the QR_TOKEN_SECRET
+    """
+    try:
+        booking = verify_token(request.token)
+    except QrTokenConfigError as e:
+        # The server is misconfigured, the token itself may be fine
+        raise HTTPException(status_code=500, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    # "today" at the market, not on the server which runs in UTC
+    market_today = datetime.now(ZoneInfo(config.MARKET_TZ)).date()
+    if booking['date'] != market_today:
+        raise HTTPException(status_code=403, detail=f"This QR token is for {booking['date']}, not today")
+
+    return {
+        "status": "success",
+        "message": "Welcome to the market!",
+        "booking_id": booking['booking_id'],
+        "slot_id": booking['slot_id'],
+        "user_id": booking['user_id'],
+        "date": booking['date']
+    }
+
+@router.get("/get_qr_tokens")
+def get_qr_tokens( date: str, stall_id: Optional[int] = None, conn = Depends(get_db_connection) ):
+    """
+    returns the QR tokens of all paid bookings on a date (optionally only for one stall),
+    and the booking_ids whose tokens were revoked. gate devices download this before the market opens
+    and only let in tokens from the list
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT b.booking_id, b.slot_id, b.user_id, a.stall_id, b.qr_token
+            FROM slots a
+            JOIN bookings b ON b.slot_id = a.slot_id
+            WHERE a.date = %s
+              AND (%s IS NULL OR a.stall_id = %s)
+              AND b.payment_status = 'PAID'
+              AND b.qr_token IS NOT NULL
+            ORDER BY b.booking_id;
+            """,
+            (date, stall_id, stall_id)
+        )
+        tokens = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT booking_id FROM revoked_qr_tokens
+            WHERE date = %s AND (%s IS NULL OR stall_id = %s)
+            ORDER BY booking_id;
+            """,
+            (date, stall_id, stall_id)
+        )
+        revoked = [row['booking_id'] for row in cursor.fetchall()]
+        cursor.close()
+        return {
+            "tokens": tokens,
+            "revoked": revoked
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching QR tokens: {e}")
@@ -5,7 +5,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from utils.database import get_db_connection
-from tabulate import tabulate
 from fastapi.responses import PlainTextResponse
 
 router = APIRouter()
@@ -37,6 +36,9 @@ def get_stalls_table(conn = Depends(get_db_connection)):
         if not stalls:
             return "No stalls found."
 
+        # tabulate is only needed here, so it is not loaded at startup
+        from tabulate import tabulate
+
         # Convert the list of dictionaries into the table format
         table_content = tabulate(stalls, headers="keys", tablefmt="psql")
         
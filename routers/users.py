@@ -1,11 +1,12 @@
 # /get_users: Endpoint to retrieve all users
+# /get_reputation: Endpoint to retrieve a user's reputation score
 # /create_user: Endpoint to create a new user
 # /delete_user: Endpoint to delete a user
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from utils.database import get_db_connection
-from tabulate import tabulate
+from utils.reputation import get_reputation as get_cached_reputation
 from fastapi.responses import PlainTextResponse
 
 router = APIRouter()
@@ -37,6 +38,9 @@ def get_users_table(conn = Depends(get_db_connection)):
         if not users:
             return "No users found."
 
+        # tabulate is only needed here, so it is not loaded at startup
+        from tabulate import tabulate
+
         # Convert the list of dictionaries into the table format
         # tablefmt="psql" gives you that specific postgres style you asked for
         table_content = tabulate(users, headers="keys", tablefmt="psql")
@@ -45,6 +49,28 @@ def get_users_table(conn = Depends(get_db_connection)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching users: {e}")
 
+@router.get("/get_reputation")
+def get_reputation( user_id: int, conn = Depends(get_db_connection) ):
+    """
+    returns a user's reputation score, served from a cache when possible
+    """
+    cursor = conn.cursor()
+    try:
+        score = get_cached_reputation(cursor, user_id)
+        if score is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {
+            "user_id": user_id,
+            "reputation_score": score
+        }
+    except Exception as e:
+        # If it's already an HTTPException (like 409 or 404), re-raise it
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Error fetching reputation: {e}")
+    finally:
+        cursor.close()
+
 class CreateUserRequest(BaseModel):
     line_uid: str
     name: str
@@ -0,0 +1,173 @@
+# /join_waitlist: Endpoint to wait for a slot that is already booked
+# /get_waitlist: Endpoint to retrieve the waitlist of a slot
+# /leave_waitlist: Endpoint to leave the waitlist of a slot
+
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from utils.database import get_db_connection
+from routers.enums import SlotStatus
+
+router = APIRouter()
+
+class JoinWaitlistRequest(BaseModel):
+    user_id: int
+    slot_id: Optional[int] = None
+    stall_id: Optional[int] = None
+    date: Optional[str] = None
+@router.post("/join_waitlist")
+def join_waitlist( request: JoinWaitlistRequest, conn = Depends(get_db_connection) ):
+    """
+    puts a user on the waitlist of a booked slot,
+    the slot is given either by slot_id, or by stall_id and date.
+    when the booking on the slot is cancelled, the first user on the waitlist gets it,
+    so only slots with a PENDING booking (which can still be cancelled) can be waited for
+    """
+    cursor = conn.cursor()
+    try:
+        # Check if user exists
+        cursor.execute(
+            "SELECT user_id FROM users WHERE user_id = %s;",
+            (request.user_id,)
+        )
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # Find the slot, and lock it against a cancellation handing it over right now
+        if request.slot_id is not None:
+            cursor.execute(
+                "SELECT slot_id, status FROM slots WHERE slot_id = %s FOR SHARE;",
+                (request.slot_id,)
+            )
+        elif request.stall_id is not None and request.date is not None:
+            # A stall can have several slots on the same date, lock them all
+            cursor.execute(
+                "SELECT slot_id, status FROM slots WHERE stall_id = %s AND date = %s ORDER BY slot_id FOR SHARE;",
+                (request.stall_id, request.date)
+            )
+        else:
+            raise HTTPException(status_code=400, detail="Either slot_id, or stall_id and date are required")
+
+        slot_rows = cursor.fetchall()
+        if not slot_rows:
+            raise HTTPException(status_code=404, detail="Slot not found")
+
+        # Only wait if every matching slot is taken
+        if any(row['status'] == SlotStatus.AVAILABLE.value for row in slot_rows):
+            raise HTTPException(status_code=409, detail="This slot is still available, book it directly.")
+
+        # Only a PENDING booking can be cancelled and hand the slot on, a paid slot is never freed up
+        # and a locked slot has no booking at all, so nobody may wait for those.
+        # the lock makes a /pay of the booking wait until we are on the waitlist, it then clears it
+        cursor.execute(
+            """
+            SELECT slot_id, user_id, payment_status FROM bookings
+            WHERE slot_id = ANY(%s) AND payment_status IN ('PENDING', 'PAID')
+            FOR SHARE;
+            """,
+            ([row['slot_id'] for row in slot_rows],)
+        )
+        active_by_slot = {row['slot_id']: row for row in cursor.fetchall()}
+        free_to_wait = []
+        for row in slot_rows:
+            active = active_by_slot.get(row['slot_id'])
+            # The user holding a slot can't wait for it, cancelling would hand it straight back to them
+            if active and active['payment_status'] == 'PENDING' and active['user_id'] != request.user_id:
+                free_to_wait.append(row['slot_id'])
+        if not free_to_wait:
+            active_rows = active_by_slot.values()
+            if any(active['user_id'] == request.user_id for active in active_rows):
+                raise HTTPException(status_code=409, detail="You already booked this slot.")
+            if any(active['payment_status'] == 'PAID' for active in active_rows):
+                raise HTTPException(status_code=409, detail="This slot is already paid for, it won't be freed up.")
+            raise HTTPException(status_code=409, detail="This slot is not open for booking.")
+        slot_id = free_to_wait[0]
+
+        cursor.execute(
+            """
+            INSERT INTO waitlist (slot_id, user_id)
+            VALUES (%s, %s)
+            ON CONFLICT (slot_id, user_id) DO NOTHING;
+            """,
+            (slot_id, request.user_id)
+        )
+
+        # Position counts from 1, the user's own entry included
+        cursor.execute(
+            """
+            SELECT COUNT(*) AS position FROM waitlist
+            WHERE slot_id = %s
+              AND waitlist_id <= (SELECT waitlist_id FROM waitlist WHERE slot_id = %s AND user_id = %s);
+            """,
+            (slot_id, slot_id, request.user_id)
+        )
+        position = cursor.fetchone()['position']
+
+        conn.commit()
+        return {
+            "status": "success",
+            "message": "Joined the waitlist!",
+            "slot_id": slot_id,
+            "position": position
+        }
+    except Exception as e:
+        conn.rollback()
+        # If it's already an HTTPException (like 409 or 404), re-raise it
+        if isinstance(e, HTTPException):
+            raise e
+        # Otherwise, it's a server error
+        raise HTTPException(status_code=500, detail=str(e))
+
+    finally:
+        cursor.close()
+
+@router.get("/get_waitlist")
+def get_waitlist( slot_id: int, conn = Depends(get_db_connection) ):
+    """
+    returns the waitlist of a slot, first in line comes first
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM waitlist WHERE slot_id = %s ORDER BY waitlist_id;",
+            (slot_id,)
+        )
+        waitlist = cursor.fetchall()
+        cursor.close()
+        return waitlist
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching waitlist: {e}")
+
+class LeaveWaitlistRequest(BaseModel):
+    user_id: int
+    slot_id: int
+@router.delete("/leave_waitlist")
+def leave_waitlist( request: LeaveWaitlistRequest, conn = Depends(get_db_connection) ):
+    """
+    removes a user from the waitlist of a slot
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "DELETE FROM waitlist WHERE slot_id = %s AND user_id = %s;",
+            (request.slot_id, request.user_id)
+        )
+        if cursor.rowcount == 0:
+            conn.rollback()
+            raise HTTPException(status_code=404, detail="User is not on the waitlist")
+
+        conn.commit()
+        return {
+            "status": "success",
+            "message": "Left the waitlist successfully!"
+        }
+    except Exception as e:
+        conn.rollback()
+        # If it's already an HTTPException (like 409 or 404), re-raise it
+        if isinstance(e, HTTPException):
+            raise e
+        # Otherwise, it's a server error
+        raise HTTPException(status_code=500, detail=str(e))
+
+    finally:
+        cursor.close()
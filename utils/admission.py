@@ -0,0 +1,132 @@
+import time
+import asyncio
+import threading
+from enum import Enum
+from utils import config
+
+class Admission(Enum):
+    ADMITTED = 0 # go ahead to the database
+    SOLD = 1     # the slot is known to be taken, answer 409
+    SHED = 2     # too busy (queue full or waited too long), answer 503
+
+class SlotAdmission:
+    """
+    per-slot admission control for the /book surge.
+
+    only `max_contenders` requests per slot are let through to the database at once,
+    the rest wait in a bounded queue. once a slot is known to be taken it is kept in a
+    short-lived "sold" set, so later requests (queued ones included) are rejected without
+    touching the database.
+    waiting happens on the event loop, so queued requests don't hold threadpool threads.
+    mark_sold / mark_available / leave may be called from any thread.
+    note: the state is in-memory, so every worker process keeps its own copy. a slot freed
+    through another process stays "sold" here until its mark expires, hence the short sold_ttl
+    """
+    def __init__(self, max_contenders=2, max_waiting=100, wait_timeout=2.0, sold_ttl=3.0):
+        self.max_contenders = max_contenders
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.sold_ttl = sold_ttl
+
+        self._lock = threading.Lock()
+        self._active = {}   # slot_id -> number of requests currently in the database
+        self._waiting = 0   # number of requests queued across all slots
+        self._waiters = {}  # slot_id -> list of (loop, future) to wake when the slot changes
+        self._sold = {}     # slot_id -> time when the "sold" mark expires
+
+    def _is_sold(self, slot_id):
+        # callers hold self._lock
+        expires_at = self._sold.get(slot_id)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._sold[slot_id]
+            return False
+        return True
+
+    def _wake(self, slot_id):
+        # callers hold self._lock
+        for loop, future in self._waiters.get(slot_id, []):
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def is_sold(self, slot_id):
+        """
+        returns True if the slot was recently seen as taken
+        """
+        with self._lock:
+            return self._is_sold(slot_id)
+
+    def mark_sold(self, slot_id):
+        with self._lock:
+            self._sold[slot_id] = time.monotonic() + self.sold_ttl
+            # queued requests can give up right away
+            self._wake(slot_id)
+
+    def mark_available(self, slot_id):
+        with self._lock:
+            self._sold.pop(slot_id, None)
+
+    async def enter(self, slot_id):
+        """
+        waits for a free contender place on the slot, returns an Admission
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        future = None
+        try:
+            while True:
+                with self._lock:
+                    if self._is_sold(slot_id):
+                        return Admission.SOLD
+                    if self._active.get(slot_id, 0) < self.max_contenders:
+                        self._active[slot_id] = self._active.get(slot_id, 0) + 1
+                        return Admission.ADMITTED
+                    if future is None:
+                        if self._waiting >= self.max_waiting:
+                            return Admission.SHED
+                        self._waiting += 1
+                    future = loop.create_future()
+                    self._waiters.setdefault(slot_id, []).append((loop, future))
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return Admission.SHED
+                try:
+                    await asyncio.wait_for(future, remaining)
+                except asyncio.TimeoutError:
+                    return Admission.SHED
+                finally:
+                    with self._lock:
+                        self._remove_waiter(slot_id, future)
+        finally:
+            if future is not None:
+                with self._lock:
+                    self._waiting -= 1
+
+    def _remove_waiter(self, slot_id, future):
+        # callers hold self._lock
+        waiters = [w for w in self._waiters.get(slot_id, []) if w[1] is not future]
+        if waiters:
+            self._waiters[slot_id] = waiters
+        else:
+            self._waiters.pop(slot_id, None)
+
+    def leave(self, slot_id):
+        with self._lock:
+            active = self._active.get(slot_id, 0) - 1
+            if active > 0:
+                self._active[slot_id] = active
+            else:
+                self._active.pop(slot_id, None)
+            self._wake(slot_id)
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+slot_admission = SlotAdmission(
+    max_contenders = config.BOOKING_MAX_CONTENDERS,
+    max_waiting = config.BOOKING_MAX_WAITING,
+    wait_timeout = config.BOOKING_WAIT_TIMEOUT,
+    sold_ttl = config.BOOKING_SOLD_TTL
+)
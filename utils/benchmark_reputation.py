@@ -0,0 +1,109 @@
+# times the reputation batch job on generated data.
+# run from the same directory as main.py, against a test database (it writes to it):
+#   python -m utils.benchmark_reputation [bookings] [users]
+# it adds `users` users, one stall, a year of slots and `bookings` bookings with a mix of
+# paid, pending (past and future) and cancelled (early and late) ones, then times
+#   - the full recompute on changed data
+#   - the full recompute again, when nothing changes
+#   - recomputing one user, like the outbox handler does
+# and prints the query plan of the full recompute. the generated data is deleted at the end.
+
+import sys
+import time
+from utils import config
+from utils.database import open_db_connection
+from utils.reputation import RECOMPUTE_ALL_SQL, RECOMPUTE_USERS_SQL
+
+SEED_SQL = """
+INSERT INTO stalls (location_name, facilities) VALUES ('reputation-benchmark', 'benchmark') RETURNING stall_id;
+"""
+
+def seed(cursor, bookings, users):
+    cursor.execute(SEED_SQL)
+    stall_id = cursor.fetchone()['stall_id']
+
+    cursor.execute(
+        """
+        INSERT INTO users (line_uid, name)
+        SELECT 'reputation-benchmark-' || i, 'Benchmark User ' || i
+        FROM generate_series(1, %s) AS i;
+        """,
+        (users,)
+    )
+    # one slot per day, half a year back and half a year ahead, so some pending bookings are no-shows
+    cursor.execute(
+        """
+        INSERT INTO slots (stall_id, date, price, status)
+        SELECT %s, CURRENT_DATE + d, 500, 2
+        FROM generate_series(-182, 182) AS d;
+        """,
+        (stall_id,)
+    )
+    cursor.execute(
+        """
+        INSERT INTO bookings (slot_id, user_id, payment_status, canceled_at)
+        SELECT
+            s.slot_ids[1 + (i %% array_length(s.slot_ids, 1))],
+            u.user_ids[1 + ((i::bigint * 7919) %% array_length(u.user_ids, 1))],
+            CASE i %% 4 WHEN 0 THEN 'PAID' WHEN 1 THEN 'PENDING' ELSE 'CANCELED' END,
+            CASE WHEN i %% 4 >= 2 THEN CURRENT_DATE + (i %% 365) - 182 - (i %% 3) END
+        FROM generate_series(1, %s) AS i,
+             (SELECT array_agg(slot_id) AS slot_ids FROM slots WHERE stall_id = %s) s,
+             (SELECT array_agg(user_id) AS user_ids FROM users WHERE line_uid LIKE 'reputation-benchmark-%%') u;
+        """,
+        (bookings, stall_id)
+    )
+    return stall_id
+
+def cleanup(cursor, stall_id):
+    cursor.execute("DELETE FROM bookings WHERE slot_id IN (SELECT slot_id FROM slots WHERE stall_id = %s);", (stall_id,))
+    cursor.execute("DELETE FROM slots WHERE stall_id = %s;", (stall_id,))
+    cursor.execute("DELETE FROM stalls WHERE stall_id = %s;", (stall_id,))
+    cursor.execute("DELETE FROM users WHERE line_uid LIKE 'reputation-benchmark-%';")
+
+def timed(conn, sql, params=None):
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    changed = cursor.rowcount
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    return elapsed, changed
+
+def main(bookings=1000000, users=50000):
+    conn = open_db_connection()
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    stall_id = seed(cursor, bookings, users)
+    conn.commit()
+    cursor.execute("ANALYZE users; ANALYZE slots; ANALYZE bookings;")
+    conn.commit()
+    print(f"seeded {bookings} bookings for {users} users in {time.perf_counter() - start:.1f}s")
+
+    try:
+        elapsed, changed = timed(conn, RECOMPUTE_ALL_SQL, {"tz": config.MARKET_TZ})
+        print(f"full recompute:            {elapsed:.2f}s, {changed} users changed")
+        elapsed, changed = timed(conn, RECOMPUTE_ALL_SQL, {"tz": config.MARKET_TZ})
+        print(f"full recompute, no change: {elapsed:.2f}s, {changed} users changed")
+
+        cursor.execute("SELECT user_id FROM users WHERE line_uid = 'reputation-benchmark-1';")
+        user_id = cursor.fetchone()['user_id']
+        elapsed, _ = timed(conn, RECOMPUTE_USERS_SQL, {"user_ids": [user_id], "tz": config.MARKET_TZ})
+        print(f"one user:                  {elapsed * 1000:.1f} ms")
+
+        cursor.execute("EXPLAIN " + RECOMPUTE_ALL_SQL, {"tz": config.MARKET_TZ})
+        print("plan of the full recompute:")
+        for row in cursor.fetchall():
+            print(f"  {row['QUERY PLAN']}")
+        conn.rollback()
+    finally:
+        cleanup(cursor, stall_id)
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    main(bookings, users)
@@ -0,0 +1,42 @@
+# all settings of the API, read once from the environment (and the .env file) when first imported.
+# see .env_template for what each setting does
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()  # take environment variables from .env file
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+# seconds to wait for the database when connecting, without it an unreachable host blocks for minutes
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# connection pool
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "2.0"))
+DB_POOL_MAX_WAITING = int(os.getenv("DB_POOL_MAX_WAITING", "10"))
+DB_POOL_PREWARM = os.getenv("DB_POOL_PREWARM", "false").lower() in ("1", "true", "yes")
+
+# admission control for /book
+BOOKING_MAX_CONTENDERS = int(os.getenv("BOOKING_MAX_CONTENDERS", "2"))
+BOOKING_MAX_WAITING = int(os.getenv("BOOKING_MAX_WAITING", "100"))
+BOOKING_WAIT_TIMEOUT = float(os.getenv("BOOKING_WAIT_TIMEOUT", "2.0"))
+# the "sold" mark is per process, a slot cancelled through another worker process
+# is answered with 409 here for up to this long, so keep it short
+BOOKING_SOLD_TTL = float(os.getenv("BOOKING_SOLD_TTL", "3.0"))
+
+# outbox workers
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "60.0"))
+
+# reputation
+REPUTATION_CACHE_TTL = float(os.getenv("REPUTATION_CACHE_TTL", "300.0"))
+
+# QR tokens
+QR_TOKEN_SECRET = os.getenv("QR_TOKEN_SECRET")
+QR_REVOKED_TTL = float(os.getenv("QR_REVOKED_TTL", "60.0"))
+# the markets' timezone, a QR token is valid on its market date in this timezone
+MARKET_TZ = os.getenv("MARKET_TZ", "Asia/Taipei")
@@ -1,21 +1,135 @@
-import os
+import time
+import random
+import threading
 import psycopg2 as pg2
+from psycopg2 import errors
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
+from fastapi import HTTPException
+from utils import config
 
-load_dotenv()
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of waiting when it runs out,
+# so requests queue on this semaphore for a free connection.
+# the wait holds a threadpool thread (40 of them), which the requests holding connections also need
+# to finish. so only DB_POOL_MAX_WAITING requests may wait, and only for DB_POOL_TIMEOUT seconds,
+# the rest get a 503 right away, or a surge fills every thread with waiters
+_pool_slots = threading.BoundedSemaphore(config.DB_POOL_MAX)
+_pool_waiting = 0
+_pool_waiting_lock = threading.Lock()
+
+def open_db_connection():
+    """
+    opens a new connection, rows are returned as dictionaries
+    """
+    return pg2.connect(
+        config.DATABASE_URL,
+        connect_timeout = config.DB_CONNECT_TIMEOUT,
+        cursor_factory = RealDictCursor
+    )
+
+def get_pool():
+    """
+    returns the connection pool, creating it on first use
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    config.DB_POOL_MIN,
+                    config.DB_POOL_MAX,
+                    config.DATABASE_URL,
+                    connect_timeout = config.DB_CONNECT_TIMEOUT,
+                    cursor_factory = RealDictCursor
+                )
+    return _pool
+
+def prewarm_pool():
+    """
+    creates the pool up front, which opens DB_POOL_MIN connections,
+    so the first requests don't pay for connecting
+    """
+    get_pool()
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+# errors that only mean another transaction got in the way, running the transaction again fixes them
+RETRYABLE_ERRORS = (errors.SerializationFailure, errors.DeadlockDetected)
+
+def run_in_transaction(conn, work, retries=3):
+    """
+    runs work(cursor) in a transaction and commits it, returns what work returned.
+    on any error the transaction is rolled back, and if it was a serialization failure
+    or a deadlock it is run again, up to `retries` more times with a short random backoff.
+    note: every transaction takes its row locks in the same order, slots before bookings
+    """
+    attempt = 0
+    while True:
+        cursor = conn.cursor()
+        try:
+            result = work(cursor)
+            conn.commit()
+            return result
+        except RETRYABLE_ERRORS:
+            conn.rollback()
+            if attempt >= retries:
+                raise
+            attempt += 1
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+def _server_busy():
+    return HTTPException(
+        status_code=503,
+        detail="The server is busy right now, please try again.",
+        headers={"Retry-After": "1"}
+    )
+
+def _acquire_pool_slot():
+    global _pool_waiting
+    if _pool_slots.acquire(blocking=False):
+        return
+    with _pool_waiting_lock:
+        if _pool_waiting >= config.DB_POOL_MAX_WAITING:
+            raise _server_busy()
+        _pool_waiting += 1
+    try:
+        acquired = _pool_slots.acquire(timeout=config.DB_POOL_TIMEOUT)
+    finally:
+        with _pool_waiting_lock:
+            _pool_waiting -= 1
+    if not acquired:
+        raise _server_busy()
 
 def get_db_connection():
+    _acquire_pool_slot()
     conn = None
     try:
-        conn = pg2.connect(
-            os.getenv("DATABASE_URL"),
-            cursor_factory = RealDictCursor
-        )
+        pool = get_pool()
+        conn = pool.getconn()
         yield conn
     except Exception as e:
         print(f"Database connection error: {e}")
         raise e
     finally:
         if conn:
-            conn.close()
+            # Hand the connection back clean, or throw it away if it broke
+            broken = bool(conn.closed)
+            if not broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            pool.putconn(conn, close=broken)
+        _pool_slots.release()
@@ -42,8 +42,54 @@ CREATE TABLE IF NOT EXISTS bookings (
     payment_status VARCHAR(20) DEFAULT 'PENDING',
     payment_method VARCHAR(50),
     qr_token VARCHAR(100),
+    canceled_at TIMESTAMPTZ, -- with the timezone, so it can be compared in the market's timezone
+    promoted BOOLEAN NOT NULL DEFAULT FALSE, -- given to the user from the waitlist, not booked by them
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS canceled_at TIMESTAMPTZ; -- for databases created before the column existed
+ALTER TABLE bookings ALTER COLUMN canceled_at TYPE TIMESTAMPTZ; -- it was a TIMESTAMP at first, kept in the server's timezone
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS promoted BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- 5. Waitlist Table (Users queued for a fully booked slot, first in first out)
+CREATE TABLE IF NOT EXISTS waitlist (
+    waitlist_id BIGSERIAL PRIMARY KEY,
+    slot_id INTEGER NOT NULL REFERENCES slots(slot_id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (slot_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS waitlist_slot_idx ON waitlist (slot_id, waitlist_id);
+
+-- 6. Outbox Table (Side-effects of bookings, written in the booking's transaction and sent by background workers)
+CREATE TABLE IF NOT EXISTS outbox (
+    event_id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    handler VARCHAR(100), -- empty until a worker splits the event into one row per handler
+    payload JSONB NOT NULL,
+    status VARCHAR(10) DEFAULT 'PENDING', -- PENDING or FAILED, sent events are deleted
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT,
+    available_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE outbox ADD COLUMN IF NOT EXISTS handler VARCHAR(100); -- for databases created before the column existed
+CREATE INDEX IF NOT EXISTS outbox_pending_idx ON outbox (available_at, event_id) WHERE status = 'PENDING';
+
+-- 7. Revoked QR Tokens Table (Tokens of deleted bookings, the gate must not accept them)
+CREATE TABLE IF NOT EXISTS revoked_qr_tokens (
+    booking_id INTEGER PRIMARY KEY, -- not a foreign key, the booking is deleted
+    date DATE NOT NULL,
+    stall_id INTEGER,
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS revoked_qr_tokens_date_idx ON revoked_qr_tokens (date);
+
+-- Indexes for the gate devices downloading a day's QR tokens
+CREATE INDEX IF NOT EXISTS slots_date_idx ON slots (date);
+CREATE INDEX IF NOT EXISTS bookings_slot_idx ON bookings (slot_id);
+
+-- Index for recomputing a single user's reputation score
+CREATE INDEX IF NOT EXISTS bookings_user_idx ON bookings (user_id);
 """
 
 def init_db():
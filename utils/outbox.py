@@ -0,0 +1,220 @@
+import threading
+from psycopg2.extras import Json
+from utils import config
+from utils.database import open_db_connection
+
+# event_type -> list of handlers, a handler is called as handler(cursor, payload)
+_handlers = {}
+# handler name -> handler, the outbox rows refer to handlers by name
+_handlers_by_name = {}
+
+def register_handler(event_type):
+    """
+    decorator that makes a function handle every event of `event_type`.
+    every handler gets its own outbox row, so it is retried on its own when it fails,
+    and its database writes are committed together with the removal of that row.
+    a handler that talks to the outside world can still run twice if the worker dies
+    between the call and the commit
+    """
+    def decorator(handler):
+        _handlers.setdefault(event_type, []).append(handler)
+        _handlers_by_name[handler.__name__] = handler
+        return handler
+    return decorator
+
+def enqueue_event(cursor, event_type, payload):
+    """
+    writes an event into the outbox, call it inside the transaction that made the change,
+    so the event is only sent if that transaction commits
+    """
+    cursor.execute(
+        "INSERT INTO outbox (event_type, payload) VALUES (%s, %s);",
+        (event_type, Json(payload))
+    )
+
+def _check_handlers():
+    # without any handler every event would fail, most likely utils.outbox_handlers wasn't imported
+    if not _handlers:
+        raise RuntimeError("No outbox handlers registered, import utils.outbox_handlers first")
+
+def claim_batch(conn, batch_size=50, lease=60.0):
+    """
+    claims up to `batch_size` due outbox rows and commits right away, so no locks are held
+    while the handlers run. a claimed row is hidden from other workers for `lease` seconds,
+    after that it is picked up again (eg: when the worker died).
+    a new event is first split into one row per handler, an event nobody handles is marked FAILED.
+    returns (claimed rows, number of due rows found)
+    """
+    _check_handlers()
+    cursor = conn.cursor()
+    try:
+        # SKIP LOCKED lets several workers claim rows without waiting on each other
+        cursor.execute(
+            """
+            SELECT event_id, event_type, handler, payload FROM outbox
+            WHERE status = 'PENDING' AND available_at <= CURRENT_TIMESTAMP
+            ORDER BY available_at, event_id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED;
+            """,
+            (batch_size,)
+        )
+        events = cursor.fetchall()
+
+        claimed = []
+        for event in events:
+            if event['handler'] is None and not _handlers.get(event['event_type']):
+                # Keep it, so it can be sent once a handler exists
+                cursor.execute(
+                    "UPDATE outbox SET status = 'FAILED', last_error = %s WHERE event_id = %s;",
+                    (f"No outbox handler registered for {event['event_type']}", event['event_id'])
+                )
+            elif event['handler'] is None:
+                for handler in _handlers[event['event_type']]:
+                    cursor.execute(
+                        """
+                        INSERT INTO outbox (event_type, handler, payload, attempts, available_at)
+                        VALUES (%s, %s, %s, 1, CURRENT_TIMESTAMP + %s * INTERVAL '1 second')
+                        RETURNING event_id, handler, payload, attempts;
+                        """,
+                        (event['event_type'], handler.__name__, Json(event['payload']), lease)
+                    )
+                    claimed.append(cursor.fetchone())
+                cursor.execute("DELETE FROM outbox WHERE event_id = %s;", (event['event_id'],))
+            else:
+                cursor.execute(
+                    """
+                    UPDATE outbox
+                    SET attempts = attempts + 1,
+                        available_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+                    WHERE event_id = %s
+                    RETURNING event_id, handler, payload, attempts;
+                    """,
+                    (lease, event['event_id'])
+                )
+                claimed.append(cursor.fetchone())
+
+        conn.commit()
+        return claimed, len(events)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def run_claimed(conn, event, max_attempts=5):
+    """
+    runs the handler of one claimed row in its own transaction, which also deletes the row.
+    a handler may return a function, it is called once that transaction has committed.
+    on failure the row is retried later with exponential backoff, or marked FAILED
+    """
+    cursor = conn.cursor()
+    try:
+        handler = _handlers_by_name.get(event['handler'])
+        if handler is None:
+            raise LookupError(f"No outbox handler named {event['handler']}")
+        after_commit = handler(cursor, event['payload'])
+        cursor.execute("DELETE FROM outbox WHERE event_id = %s;", (event['event_id'],))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        cursor.execute(
+            """
+            UPDATE outbox
+            SET last_error = %s,
+                status = %s,
+                available_at = CURRENT_TIMESTAMP + LEAST(POWER(2, %s), 300) * INTERVAL '1 second'
+            WHERE event_id = %s;
+            """,
+            (str(e), 'FAILED' if event['attempts'] >= max_attempts else 'PENDING', event['attempts'], event['event_id'])
+        )
+        conn.commit()
+        return
+    finally:
+        cursor.close()
+
+    if after_commit is not None:
+        after_commit()
+
+def process_batch(conn, batch_size=50, max_attempts=5, lease=60.0):
+    """
+    claims a batch of outbox rows and runs them one by one,
+    returns the number of due rows found
+    """
+    claimed, found = claim_batch(conn, batch_size, lease)
+    for event in claimed:
+        run_claimed(conn, event, max_attempts)
+    return found
+
+class OutboxWorkerPool:
+    """
+    background threads that keep draining the outbox,
+    each thread holds its own connection and sleeps while there is nothing to send
+    """
+    def __init__(self, workers=2, batch_size=50, poll_interval=1.0, max_attempts=5, lease=60.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.workers:
+            _check_handlers()
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        conn = None
+        while not self._stop.is_set():
+            try:
+                if conn is None or conn.closed:
+                    conn = open_db_connection()
+                claimed = process_batch(conn, self.batch_size, self.max_attempts, self.lease)
+                # A full batch means there is probably more waiting, so go again right away
+                if claimed < self.batch_size:
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                print(f"Outbox worker error: {e}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                self._stop.wait(self.poll_interval)
+        if conn is not None:
+            conn.close()
+
+outbox_workers = OutboxWorkerPool(
+    workers = config.OUTBOX_WORKERS,
+    batch_size = config.OUTBOX_BATCH_SIZE,
+    poll_interval = config.OUTBOX_POLL_INTERVAL,
+    max_attempts = config.OUTBOX_MAX_ATTEMPTS,
+    lease = config.OUTBOX_LEASE
+)
+
+if __name__ == "__main__":
+    # drain the outbox once, handy for local testing.
+    # go through the imported module, the handlers register themselves there and not on __main__
+    import utils.outbox_handlers  # noqa: F401
+    from utils import outbox
+
+    conn = open_db_connection()
+    total = 0
+    while True:
+        workers = outbox.outbox_workers
+        claimed = outbox.process_batch(conn, workers.batch_size, workers.max_attempts, workers.lease)
+        total += claimed
+        if claimed == 0:
+            break
+    conn.close()
+    print(f"Processed {total} events")
@@ -0,0 +1,70 @@
+# handlers for the booking events in the outbox,
+# importing this module registers them with utils.outbox
+
+from utils.outbox import register_handler
+from utils.qr_token import issue_token
+from utils.reputation import recompute_reputation, cache_scores
+
+def send_line_message(line_uid, text):
+    """
+    local stub for the LINE messaging API, only prints the message
+    """
+    print(f"[LINE -> {line_uid}] {text}")
+
+def notify_user(cursor, user_id, text):
+    cursor.execute(
+        "SELECT line_uid FROM users WHERE user_id = %s;",
+        (user_id,)
+    )
+    user_row = cursor.fetchone()
+    if user_row:
+        send_line_message(user_row['line_uid'], text)
+
+@register_handler("booking.created")
+def notify_booking_created(cursor, payload):
+    notify_user(cursor, payload['user_id'], f"Your booking #{payload['booking_id']} is confirmed, please pay to keep it.")
+
+@register_handler("booking.promoted")
+def notify_booking_promoted(cursor, payload):
+    notify_user(cursor, payload['user_id'], f"A slot you waited for is free! Booking #{payload['booking_id']} is yours, please pay to keep it.")
+
+@register_handler("booking.paid")
+def issue_qr_token(cursor, payload):
+    cursor.execute(
+        """
+        SELECT b.booking_id, b.slot_id, b.user_id, s.date
+        FROM bookings b
+        JOIN slots s ON b.slot_id = s.slot_id
+        WHERE b.booking_id = %s AND b.payment_status = 'PAID';
+        """,
+        (payload['booking_id'],)
+    )
+    booking_row = cursor.fetchone()
+    if not booking_row:
+        return
+    cursor.execute(
+        "UPDATE bookings SET qr_token = %s WHERE booking_id = %s;",
+        (
+            issue_token(booking_row['booking_id'], booking_row['slot_id'], booking_row['user_id'], booking_row['date']),
+            booking_row['booking_id']
+        )
+    )
+
+@register_handler("booking.paid")
+def notify_booking_paid(cursor, payload):
+    notify_user(cursor, payload['user_id'], f"Payment for booking #{payload['booking_id']} received, see you at the market!")
+
+@register_handler("waitlist.closed")
+def notify_waitlist_closed(cursor, payload):
+    notify_user(cursor, payload['user_id'], f"Slot #{payload['slot_id']} you waited for has been paid for, you were taken off its waitlist.")
+
+@register_handler("booking.canceled")
+def notify_booking_canceled(cursor, payload):
+    notify_user(cursor, payload['user_id'], f"Your booking #{payload['booking_id']} is cancelled.")
+
+@register_handler("booking.paid")
+@register_handler("booking.canceled")
+def update_reputation(cursor, payload):
+    user_rows = recompute_reputation(cursor, [payload['user_id']])
+    # only cache the new score once it is committed
+    return lambda: cache_scores(user_rows)
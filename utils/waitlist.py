@@ -0,0 +1,37 @@
+from utils.outbox import enqueue_event
+
+def promote_next_waiter(cursor, slot_id):
+    """
+    pops the first user off the slot's waitlist and gives them a PENDING booking on the slot.
+    must run in the same transaction that freed the slot, with the slot row already locked,
+    returns the new booking row or None if nobody is waiting
+    """
+    cursor.execute(
+        """
+        DELETE FROM waitlist
+        WHERE waitlist_id = (
+            SELECT waitlist_id FROM waitlist
+            WHERE slot_id = %s
+            ORDER BY waitlist_id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING user_id;
+        """,
+        (slot_id,)
+    )
+    waiter_row = cursor.fetchone()
+    if not waiter_row:
+        return None
+
+    cursor.execute(
+        """
+        INSERT INTO bookings (user_id, slot_id, payment_status, promoted)
+        VALUES (%s, %s, 'PENDING', TRUE)
+        RETURNING booking_id, user_id, slot_id;
+        """,
+        (waiter_row['user_id'], slot_id)
+    )
+    promoted = cursor.fetchone()
+    enqueue_event(cursor, "booking.promoted", dict(promoted))
+    return promoted